@@ -3,21 +3,23 @@
 Bot Listener System Server
 -------------------------
 * Python 3.9+ recommended
-* Dependencies: fastapi, uvicorn, websockets, openai, python-dotenv
-* Start with: uvicorn bot_system.app:app --reload
+* Dependencies: fastapi, uvicorn, websockets, openai, orjson, python-dotenv
+* Start with: uvicorn bot_system.app:app --reload --loop uvloop --ws-per-message-deflate false
 """
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, BackgroundTasks
+import asyncio
 import logging
 import time
 import uuid
-import json
+from typing import Set
 
 # Import local modules
 from bot_system.services.connection_service import ConnectionService
 from bot_system.services.context_service import StreamContextService
-from bot_system.services.reaction_service import ReactionService
+from bot_system.services.reaction_service import ReactionService, ReactionInterrupted
 from bot_system.models.message import SystemMessage, StreamContent, BotReaction
+from bot_system.models.stream_context import StreamContext
 from bot_system.config import setup_logging, get_settings
 
 # Setup logging
@@ -38,10 +40,17 @@ context_service = StreamContextService(
 
 reaction_service = ReactionService(
     openai_api_key=settings.openai_api_key,
-    openai_model=settings.openai_model
+    openai_model=settings.openai_model,
+    max_concurrency=settings.openai_concurrency
 )
 
 
+# In-flight AI reaction tasks (kept referenced until they finish)
+reaction_tasks: Set[asyncio.Task] = set()
+
+# Raw frame prefixes used to spot heartbeats without parsing JSON
+HEARTBEAT_PREFIXES = ('{"type":"heartbeat"', '{"type": "heartbeat"')
+
 # FastAPI application
 app = FastAPI(title="Bot Listener System")
 
@@ -72,14 +81,15 @@ async def broadcaster_endpoint(websocket: WebSocket, background_tasks: Backgroun
             await process_broadcaster_message(data, stream_id)
     
     except WebSocketDisconnect:
-        await connection_service.disconnect_broadcaster()
+        await connection_service.disconnect_broadcaster(websocket)
     except Exception as e:
         logger.error(f"Broadcaster endpoint error: {e}")
-        await connection_service.disconnect_broadcaster()
+        await connection_service.disconnect_broadcaster(websocket)
 
 
 async def process_broadcaster_message(data: str, stream_id: str):
     """Process messages from the broadcaster"""
+    now = time.time()
     try:
         # Try to parse as JSON, fall back to plain text
         message_data = StreamContent.parse_raw_or_text(data)
@@ -107,17 +117,7 @@ async def process_broadcaster_message(data: str, stream_id: str):
         
         # Broadcast to bot viewers
         await connection_service.broadcast_to_bots(
-            StreamContent(
-                type="stream_content",
-                content=message_data.content,
-                timestamp=time.time(),
-                stream_info={
-                    "title": current_context["title"],
-                    "duration": current_context["duration"],
-                    "viewers": connection_service.get_bot_count(),
-                    "mood": current_context["mood"]
-                }
-            ).to_dict()
+            build_stream_content("stream_content", message_data.content, now, current_context)
         )
         
         logger.info(f"Broadcasted content: {message_data.content[:50]}...")
@@ -126,6 +126,42 @@ async def process_broadcaster_message(data: str, stream_id: str):
         logger.error(f"Error processing broadcaster message: {e}")
 
 
+def build_stream_content(message_type: str, content: str, timestamp: float, context: StreamContext) -> dict:
+    """Build an outbound stream content message"""
+    # Same fields as StreamContent.to_dict(), without the cost of building a model
+    return {
+        "type": message_type,
+        "timestamp": timestamp,
+        "content": content,
+        "command": None,
+        "stream_info": {
+            "title": context.title,
+            "duration": context.duration,
+            "viewers": connection_service.get_bot_count(),
+            "mood": context.mood
+        },
+        "metadata": {}
+    }
+
+
+def build_bot_reaction(
+    message_type: str,
+    content: str,
+    bot_info: dict,
+    timestamp: float,
+    ai_generated: bool = False
+) -> dict:
+    """Build an outbound bot reaction message"""
+    # Same fields as BotReaction.to_dict(), without the cost of building a model
+    return {
+        "type": message_type,
+        "timestamp": timestamp,
+        "content": content,
+        "bot_info": bot_info,
+        "ai_generated": ai_generated
+    }
+
+
 async def handle_broadcaster_command(command: str):
     """Handle commands from the broadcaster"""
     if command == "get_viewers":
@@ -141,27 +177,19 @@ async def handle_broadcaster_command(command: str):
 @app.websocket("/bot-viewer")
 async def bot_viewer_endpoint(websocket: WebSocket):
     """Endpoint for bot viewers to connect and receive stream content"""
-    await connection_service.connect_bot_viewer(websocket)
+    if not await connection_service.connect_bot_viewer(websocket):
+        return
+    now = time.time()
     
     # Get default stream context
     stream_id = context_service.default_stream_id
     current_context = context_service.get_context(stream_id)
     
     # Send current stream info
-    if current_context["start_time"]:
+    if current_context.start_time:
         await connection_service.send_to_bot(
             websocket,
-            StreamContent(
-                type="stream_info",
-                content="",
-                timestamp=time.time(),
-                stream_info={
-                    "title": current_context["title"],
-                    "duration": current_context["duration"],
-                    "viewers": connection_service.get_bot_count(),
-                    "mood": current_context["mood"]
-                }
-            ).to_dict()
+            build_stream_content("stream_info", "", now, current_context)
         )
     
     # Notify broadcaster about viewer joining
@@ -170,7 +198,7 @@ async def bot_viewer_endpoint(websocket: WebSocket):
             "type": "viewer_update",
             "count": connection_service.get_bot_count(),
             "event": "join",
-            "timestamp": time.time()
+            "timestamp": now
         })
         
         # Update viewer count
@@ -191,85 +219,114 @@ async def bot_viewer_endpoint(websocket: WebSocket):
 
 async def process_bot_message(websocket: WebSocket, data: str, stream_id: str):
     """Process messages from bot viewers"""
+    # Heartbeats dominate inbound traffic; an unchanged one needs no parsing
+    if data.startswith(HEARTBEAT_PREFIXES) and not connection_service.record_heartbeat(websocket, data):
+        return
+    
     try:
-        message_data = BotReaction.parse_raw_or_text(data)
-        message_type = message_data.type
+        # Bots may merge queued messages into a single JSON array frame
+        for message_data in BotReaction.parse_batch(data):
+            await handle_bot_message(websocket, message_data, stream_id)
+    
+    except Exception as e:
+        logger.error(f"Error processing bot message: {e}")
 
-        # Handle heartbeat
-        if message_type == "heartbeat":
-            connection_service.update_bot_info(websocket, message_data.bot_info)
-            return
+
+async def handle_bot_message(websocket: WebSocket, message_data: BotReaction, stream_id: str):
+    """Handle a single parsed message from a bot viewer"""
+    now = time.time()
+    message_type = message_data.type
+    
+    # Handle heartbeat
+    if message_type == "heartbeat":
+        connection_service.update_bot_info(websocket, message_data.bot_info)
+        return
+    
+    # Handle bot reaction
+    if message_type == "reaction":
+        if connection_service.broadcaster:
+            await connection_service.send_to_broadcaster(
+                build_bot_reaction("bot_reaction", message_data.content, message_data.bot_info, now)
+            )
         
-        # Handle bot reaction
-        if message_type == "reaction":
-            if connection_service.broadcaster:
-                await connection_service.send_to_broadcaster(
-                    BotReaction(
-                        type="bot_reaction",
-                        content=message_data.content,
-                        bot_info=message_data.bot_info,
-                        timestamp=time.time()
-                    ).to_dict()
-                )
-            
-            logger.info(f"Bot reaction: {message_data.content[:50]}...")
-            return
+        logger.info(f"Bot reaction: {message_data.content[:50]}...")
+        return
+    
+    # Handle stream content reception
+    if message_type == "receive_stream_content":
+        # Generate off the receive loop so this bot's next frame is read right away
+        task = asyncio.create_task(send_ai_reaction(websocket, message_data, stream_id))
+        reaction_tasks.add(task)
+        task.add_done_callback(reaction_tasks.discard)
+
+
+async def send_ai_reaction(websocket: WebSocket, message_data: BotReaction, stream_id: str):
+    """Generate an AI reaction, stream it to the bot and forward it to the broadcaster"""
+    try:
+        # Get current context
+        current_context = context_service.get_context(stream_id)
         
-        # Handle stream content reception
-        if message_type == "receive_stream_content":
-            # Get current context
-            current_context = context_service.get_context(stream_id)
-            
-            # Generate AI reaction
-            ai_reaction = await reaction_service.generate_reaction(
+        # Generate AI reaction, streaming tokens to the requesting bot only
+        # (the broadcaster just gets the full reaction). Each delta is held
+        # until the next one arrives: a reply that comes back in one piece
+        # (cache hit, canned reply) sends no deltas, and the last delta is
+        # covered by the full reaction anyway
+        parts = []
+        try:
+            async for delta in reaction_service.stream_reaction(
                 message_data.content,
                 message_data.bot_info,
                 current_context
-            )
-            
-            # Create response
-            response = BotReaction(
-                type="reaction",
-                content=ai_reaction,
-                bot_info=message_data.bot_info,
-                timestamp=time.time(),
-                ai_generated=True
-            ).to_dict()
-            
-            # Send to bot
-            await websocket.send_text(json.dumps(response, ensure_ascii=True))
-            
-            # Forward to broadcaster
-            if connection_service.broadcaster:
-                await connection_service.send_to_broadcaster({
-                    "type": "bot_reaction",
-                    "content": ai_reaction,
-                    "bot_info": message_data.bot_info,
-                    "timestamp": time.time(),
-                    "ai_generated": True
-                })
-            
-            logger.info(f"AI generated reaction: {ai_reaction[:50]}...")
+            ):
+                if parts:
+                    sent = await connection_service.send_to_bot(websocket, {
+                        "type": "reaction_delta",
+                        "content": parts[-1],
+                        "bot_info": message_data.bot_info,
+                        "timestamp": time.time()
+                    })
+                    # The bot left mid-reaction; stop streaming to it
+                    if not sent:
+                        return
+                parts.append(delta)
+            ai_reaction = "".join(parts).strip()
+        except ReactionInterrupted as e:
+            # Generation failed mid-stream; the full reaction replaces the partial deltas
+            ai_reaction = e.fallback
+        
+        # Nothing to react to (e.g. empty stream content)
+        if not ai_reaction:
+            return
+        
+        # The full reaction doubles as the completion marker for the deltas
+        response = build_bot_reaction(
+            "reaction",
+            ai_reaction,
+            message_data.bot_info,
+            time.time(),
+            ai_generated=True
+        )
+        
+        # Send to bot
+        await connection_service.send_to_bot(websocket, response)
+        
+        # Forward to broadcaster
+        if connection_service.broadcaster:
+            await connection_service.send_to_broadcaster({**response, "type": "bot_reaction"})
+        
+        logger.info(f"AI generated reaction: {ai_reaction[:50]}...")
     
     except Exception as e:
-        logger.error(f"Error processing bot message: {e}")
+        logger.error(f"Error sending AI reaction: {e}")
 
 
 async def handle_bot_disconnect(websocket: WebSocket, stream_id: str):
     """Handle bot viewer disconnection"""
+    # The writer may already have dropped the bot after a failed send
     await connection_service.disconnect_bot_viewer(websocket)
     
-    # Notify broadcaster
-    if connection_service.broadcaster:
-        await connection_service.send_to_broadcaster({
-            "type": "viewer_update",
-            "count": connection_service.get_bot_count(),
-            "event": "leave",
-            "timestamp": time.time()
-        })
-        
-        # Update viewer count
-        context_service.update_viewers(connection_service.get_bot_count(), stream_id)
+    # Update viewer count
+    context_service.update_viewers(connection_service.get_bot_count(), stream_id)
 
 
 # Health check endpoint
@@ -280,7 +337,7 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": time.time(),
-        "stream_active": default_context["start_time"] is not None,
+        "stream_active": default_context.start_time is not None,
         "connected_bots": connection_service.get_bot_count()
     }
 
@@ -317,4 +374,11 @@ async def shutdown_event():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("bot_system.app:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run(
+        "bot_system.app:app",
+        host=settings.api_host,
+        port=settings.api_port,
+        reload=True,
+        loop="uvloop",
+        ws_per_message_deflate=settings.enable_ws_compression
+    )
\ No newline at end of file
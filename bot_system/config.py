@@ -18,9 +18,15 @@ class Settings(BaseModel):
     api_host: str = os.getenv("API_HOST", "0.0.0.0")
     api_port: int = int(os.getenv("API_PORT", "8000"))
     
+    # WebSocket settings
+    # permessage-deflate costs a zlib pass per frame; leave it off and run
+    # behind a reverse proxy (nginx etc.) that terminates TLS/compression
+    enable_ws_compression: bool = os.getenv("ENABLE_WS_COMPRESSION", "false").lower() == "true"
+    
     # OpenAI settings
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     openai_model: str = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+    openai_concurrency: int = int(os.getenv("OPENAI_CONCURRENCY", "16"))
     
     # Logging settings
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
@@ -4,7 +4,11 @@ Message models for Bot Listener System
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional, List, Union
 import json
+import logging
 import time
+import orjson
+
+logger = logging.getLogger("bot_listener")
 
 
 class BaseMessage(BaseModel):
@@ -19,24 +23,49 @@ class BaseMessage(BaseModel):
     @classmethod
     def parse_raw_or_text(cls, data: str) -> 'BaseMessage':
         """Parse JSON data or treat as plain text"""
-        try:
-            return cls.model_validate_json(data)
-        except Exception:
-            # Fallback to plain text
-            if cls == StreamContent:
-                return StreamContent(
-                    type="stream_content",
-                    content=data,
-                    timestamp=time.time()
-                )
-            elif cls == BotReaction:
-                return BotReaction(
-                    type="heartbeat",  # Default to heartbeat for unparseable bot messages
-                    content="",
-                    timestamp=time.time()
-                )
-            else:
-                return cls(type="unknown", content=data)
+        # Only a JSON object can validate; plain text skips the exception path
+        if data.lstrip().startswith("{"):
+            try:
+                return cls.model_validate_json(data)
+            except Exception:
+                pass
+        
+        # Fallback to plain text
+        if cls == StreamContent:
+            return StreamContent(
+                type="stream_content",
+                content=data,
+                timestamp=time.time()
+            )
+        elif cls == BotReaction:
+            return BotReaction(
+                type="heartbeat",  # Default to heartbeat for unparseable bot messages
+                content="",
+                timestamp=time.time()
+            )
+        else:
+            return cls(type="unknown", content=data)
+    
+    @classmethod
+    def parse_batch(cls, data: str) -> List['BaseMessage']:
+        """Parse a JSON array frame of merged messages, or a single message"""
+        if data.lstrip().startswith("["):
+            try:
+                items = orjson.loads(data)
+            except orjson.JSONDecodeError:
+                items = None
+            
+            if isinstance(items, list):
+                # Validate each message on its own so one bad item doesn't drop the rest
+                messages = []
+                for item in items:
+                    try:
+                        messages.append(cls.model_validate(item))
+                    except Exception as e:
+                        logger.warning(f"Skipping invalid message in batch: {e}")
+                return messages
+        
+        return [cls.parse_raw_or_text(data)]
 
 
 class SystemMessage(BaseMessage):
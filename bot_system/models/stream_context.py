@@ -1,26 +1,45 @@
 """
 Stream context models for Bot Listener System
 """
-from pydantic import BaseModel, Field
-from typing import Dict, Any, List, Optional
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, Deque, List, Optional
 import time
 
+# Number of previous messages kept per stream
+MAX_PREVIOUS_MESSAGES = 10
 
-class StreamContext(BaseModel):
+# Number of recent messages rendered into the reaction prompt
+RENDERED_MESSAGES = 5
+
+
+@dataclass
+class StreamContext:
     """Stream context model"""
     title: str = "Test Stream"
-    start_time: float = Field(default_factory=time.time)
+    start_time: Optional[float] = field(default_factory=time.time)
     duration: float = 0
-    topics: List[str] = Field(default_factory=list)
+    topics: List[str] = field(default_factory=list)
     mood: str = "neutral"
-    previous_messages: List[str] = Field(default_factory=list)
+    previous_messages: Deque[str] = field(default_factory=lambda: deque(maxlen=MAX_PREVIOUS_MESSAGES))
     viewers: int = 0
-    broadcaster_info: Dict[str, Any] = Field(default_factory=dict)
+    broadcaster_info: Dict[str, Any] = field(default_factory=dict)
     message_count: int = 0
+    # Recent messages pre-rendered as prompt lines when they arrive
+    rendered_messages: Deque[str] = field(default_factory=lambda: deque(maxlen=RENDERED_MESSAGES))
+    # Lowercased title, kept in sync by set_title for interest matching
+    title_lower: str = field(init=False, repr=False)
+    
+    def __post_init__(self) -> None:
+        """Derive cached fields from the initial values"""
+        self.title_lower = self.title.lower()
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary"""
-        return self.model_dump()
+        data = asdict(self)
+        data["previous_messages"] = list(self.previous_messages)
+        data["rendered_messages"] = list(self.rendered_messages)
+        return data
     
     def update_duration(self) -> float:
         """Update and return the current duration"""
@@ -30,16 +49,28 @@ class StreamContext(BaseModel):
     def add_message(self, message: str) -> None:
         """Add a message to the stream context"""
         self.message_count += 1
+        # The deques drop the oldest message themselves
         self.previous_messages.append(message)
         
-        # Keep only the last 10 messages
-        if len(self.previous_messages) > 10:
-            self.previous_messages = self.previous_messages[-10:]
+        # Render the prompt line once, stamped with the stream time it was said at
+        elapsed = int(time.time() - self.start_time) if self.start_time else 0
+        minutes, seconds = divmod(elapsed, 60)
+        self.rendered_messages.append(f"{minutes}分{seconds}秒 - 配信者: {message}")
+    
+    def set_title(self, title: str) -> None:
+        """Set the stream title and merge its topics"""
+        self.title = title
+        self.title_lower = title.lower()
+        self.extract_topics_from_title()
     
     def extract_topics_from_title(self) -> List[str]:
         """Extract topics from the stream title"""
         # Simple keyword extraction - can be improved with NLP
         keywords = [word.lower() for word in self.title.split() if len(word) > 2]
-        # Merge with existing topics, avoiding duplicates
-        self.topics = list(set(self.topics + keywords))
-        return self.topics
\ No newline at end of file
+        # Append new topics in place, keeping first-seen order
+        seen = set(self.topics)
+        for keyword in keywords:
+            if keyword not in seen:
+                seen.add(keyword)
+                self.topics.append(keyword)
+        return self.topics
@@ -1,15 +1,36 @@
 """
 Connection management service for Bot Listener System
 """
-import json
 import asyncio
 import time
 import logging
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional
+import orjson
 from fastapi import WebSocket
 
 logger = logging.getLogger("bot_listener")
 
+# Maximum number of outbound messages buffered per bot viewer
+BOT_QUEUE_SIZE = 256
+
+# Maximum number of queued messages merged into a single frame
+MAX_MERGED_MESSAGES = 32
+
+
+def _dumps(message: dict) -> bytes:
+    """Serialize a message to UTF-8 encoded JSON"""
+    return orjson.dumps(message)
+
+
+@dataclass
+class BotConnection:
+    """Per-bot connection state: reported info, outbound queue, writer task and last heartbeat"""
+    info: Dict[str, Any] = field(default_factory=dict)
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=BOT_QUEUE_SIZE))
+    writer: Optional[asyncio.Task] = None
+    last_heartbeat: str = ""
+
 
 class ConnectionService:
     """Manages WebSocket connections for broadcasters and bot viewers"""
@@ -25,8 +46,11 @@ class ConnectionService:
         self.max_bot_viewers = max_bot_viewers
         self.heartbeat_interval = heartbeat_interval
         self.broadcaster: Optional[WebSocket] = None
-        self.bot_viewers: List[WebSocket] = []
-        self.bot_info: Dict[WebSocket, Dict[str, Any]] = {}
+        # Outbound queue for the broadcaster so senders never wait on its socket
+        self._broadcaster_queue: Optional[asyncio.Queue] = None
+        self._broadcaster_writer: Optional[asyncio.Task] = None
+        # Connected bot viewers; the keys double as the set of bot sockets
+        self.bot_viewers: Dict[WebSocket, BotConnection] = {}
     
     async def connect_broadcaster(self, websocket: WebSocket) -> bool:
         """
@@ -44,12 +68,30 @@ class ConnectionService:
         
         await websocket.accept()
         self.broadcaster = websocket
+        self._broadcaster_queue = asyncio.Queue(maxsize=BOT_QUEUE_SIZE)
+        self._broadcaster_writer = asyncio.create_task(
+            self._write_broadcaster(websocket, self._broadcaster_queue)
+        )
         logger.info("Broadcaster connected")
         return True
     
-    async def disconnect_broadcaster(self) -> None:
-        """Disconnect broadcaster"""
+    async def disconnect_broadcaster(self, websocket: WebSocket) -> None:
+        """
+        Disconnect broadcaster
+        
+        Args:
+            websocket: WebSocket connection; ignored unless it is the current broadcaster
+        """
+        if self.broadcaster is not websocket:
+            return
+        
+        writer = self._broadcaster_writer
+        if writer and writer is not asyncio.current_task():
+            writer.cancel()
+        
         self.broadcaster = None
+        self._broadcaster_queue = None
+        self._broadcaster_writer = None
         logger.info("Broadcaster disconnected")
     
     async def connect_bot_viewer(self, websocket: WebSocket) -> bool:
@@ -60,28 +102,50 @@ class ConnectionService:
             websocket: WebSocket connection
             
         Returns:
-            bool: True if connection successful
+            bool: True if connection successful, False if the viewer limit is reached
         """
+        if len(self.bot_viewers) >= self.max_bot_viewers:
+            await websocket.close(code=1013, reason="Too many bot viewers connected")
+            logger.warning(f"Rejected bot viewer (limit: {self.max_bot_viewers})")
+            return False
+        
         await websocket.accept()
-        self.bot_viewers.append(websocket)
-        self.bot_info[websocket] = {"connected_at": time.time()}
+        
+        # Each bot gets its own outbound queue drained by a long-lived writer
+        connection = BotConnection(info={"connected_at": time.time()})
+        connection.writer = asyncio.create_task(self._writer(websocket, connection.queue))
+        self.bot_viewers[websocket] = connection
         logger.info(f"Bot viewer connected (total: {len(self.bot_viewers)})")
         return True
     
-    async def disconnect_bot_viewer(self, websocket: WebSocket) -> None:
+    async def disconnect_bot_viewer(self, websocket: WebSocket) -> bool:
         """
-        Disconnect bot viewer
+        Disconnect bot viewer and notify the broadcaster
         
         Args:
             websocket: WebSocket connection
+            
+        Returns:
+            bool: False if the bot was already disconnected
         """
-        if websocket in self.bot_viewers:
-            self.bot_viewers.remove(websocket)
+        connection = self.bot_viewers.pop(websocket, None)
+        if connection is None:
+            return False
         
-        if websocket in self.bot_info:
-            del self.bot_info[websocket]
+        if connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
         
         logger.info(f"Bot viewer disconnected (remaining: {len(self.bot_viewers)})")
+        
+        # Notify broadcaster
+        if self.broadcaster:
+            await self.send_to_broadcaster({
+                "type": "viewer_update",
+                "count": self.get_bot_count(),
+                "event": "leave",
+                "timestamp": time.time()
+            })
+        return True
     
     async def broadcast_to_bots(self, message: dict) -> None:
         """
@@ -94,26 +158,72 @@ class ConnectionService:
             logger.warning("No bot viewers connected")
             return
         
-        tasks = [self.send_to_bot(bot, message) for bot in self.bot_viewers]
-        await asyncio.gather(*tasks, return_exceptions=True)
+        # Serialize once and hand the same payload to every bot's queue
+        payload = _dumps(message)
+        for connection in self.bot_viewers.values():
+            self._enqueue(connection, payload)
     
-    async def send_to_bot(self, bot: WebSocket, message: dict) -> None:
+    async def send_to_bot(self, bot: WebSocket, message: dict) -> bool:
         """
         Send message to a specific bot viewer
         
         Args:
             bot: Bot WebSocket connection
             message: Message to send
+            
+        Returns:
+            bool: False if the bot has disconnected
+        """
+        connection = self.bot_viewers.get(bot)
+        if connection is None:
+            logger.debug("Dropping message for disconnected bot")
+            return False
+        
+        self._enqueue(connection, _dumps(message))
+        return True
+    
+    def _enqueue(self, connection: BotConnection, payload: bytes) -> None:
+        """
+        Queue a serialized payload for a bot viewer's writer task
+        
+        Args:
+            connection: Bot connection state
+            payload: Serialized message
         """
         try:
-            await bot.send_text(json.dumps(message, ensure_ascii=True))
-        except Exception as e:
-            logger.error(f"Error sending to bot: {e}")
-            # Try to disconnect the bot if there was an error
+            connection.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Drop instead of blocking the broadcaster on a slow bot
+            logger.warning("Bot send queue full, dropping message")
+    
+    async def _writer(self, bot: WebSocket, queue: asyncio.Queue) -> None:
+        """
+        Send queued payloads to a bot viewer until it disconnects
+        
+        Messages that pile up while a send is in flight are merged into
+        a single JSON array frame.
+        
+        Args:
+            bot: Bot WebSocket connection
+            queue: Outbound queue for the bot
+        """
+        while True:
+            payloads = [await queue.get()]
+            while len(payloads) < MAX_MERGED_MESSAGES and not queue.empty():
+                payloads.append(queue.get_nowait())
+            
+            if len(payloads) == 1:
+                payload = payloads[0]
+            else:
+                payload = b"[" + b",".join(payloads) + b"]"
+            
             try:
+                await bot.send_bytes(payload)
+            except Exception as e:
+                logger.error(f"Error sending to bot: {e}")
+                # Disconnect the bot if there was an error
                 await self.disconnect_bot_viewer(bot)
-            except:
-                pass
+                return
     
     async def send_to_broadcaster(self, message: dict) -> None:
         """
@@ -127,14 +237,27 @@ class ConnectionService:
             return
         
         try:
-            await self.broadcaster.send_text(json.dumps(message, ensure_ascii=True))
-        except Exception as e:
-            logger.error(f"Error sending to broadcaster: {e}")
-            # Try to disconnect the broadcaster if there was an error
+            self._broadcaster_queue.put_nowait(_dumps(message))
+        except asyncio.QueueFull:
+            logger.warning("Broadcaster send queue full, dropping message")
+    
+    async def _write_broadcaster(self, broadcaster: WebSocket, queue: asyncio.Queue) -> None:
+        """
+        Send queued payloads to the broadcaster until it disconnects
+        
+        Args:
+            broadcaster: Broadcaster WebSocket connection
+            queue: Outbound queue for the broadcaster
+        """
+        while True:
+            payload = await queue.get()
             try:
-                await self.disconnect_broadcaster()
-            except:
-                pass
+                await broadcaster.send_bytes(payload)
+            except Exception as e:
+                logger.error(f"Error sending to broadcaster: {e}")
+                # Disconnect the broadcaster if there was an error
+                await self.disconnect_broadcaster(broadcaster)
+                return
     
     def update_bot_info(self, websocket: WebSocket, info: dict) -> None:
         """
@@ -144,8 +267,26 @@ class ConnectionService:
             websocket: Bot WebSocket connection
             info: Bot information
         """
-        if websocket in self.bot_info:
-            self.bot_info[websocket].update(info)
+        connection = self.bot_viewers.get(websocket)
+        if connection:
+            connection.info.update(info)
+    
+    def record_heartbeat(self, websocket: WebSocket, data: str) -> bool:
+        """
+        Remember the latest raw heartbeat frame from a bot
+        
+        Args:
+            websocket: Bot WebSocket connection
+            data: Raw heartbeat frame
+            
+        Returns:
+            bool: True if the frame differs from the previous heartbeat
+        """
+        connection = self.bot_viewers.get(websocket)
+        if connection is None or connection.last_heartbeat == data:
+            return False
+        connection.last_heartbeat = data
+        return True
     
     def get_bot_count(self) -> int:
         """
@@ -166,4 +307,5 @@ class ConnectionService:
         Returns:
             dict: Bot information
         """
-        return self.bot_info.get(websocket, {})
\ No newline at end of file
+        connection = self.bot_viewers.get(websocket)
+        return connection.info if connection else {}
\ No newline at end of file
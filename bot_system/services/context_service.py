@@ -1,12 +1,33 @@
 """
 Stream context management service for Bot Listener System
 """
-import time
+import re
 import logging
-from typing import Dict, Any, List, Optional
+from collections import deque
+from typing import Dict, Optional
+
+from bot_system.models.stream_context import StreamContext
 
 logger = logging.getLogger("bot_listener")
 
+# Keyword lists for simple sentiment analysis
+MOOD_KEYWORDS = {
+    "positive": frozenset(["楽しい", "嬉しい", "面白い", "すごい", "好き", "最高", "happy", "fun", "great"]),
+    "negative": frozenset(["難しい", "悲しい", "辛い", "苦しい", "嫌い", "最悪", "sad", "hard", "tough"]),
+    "excited": frozenset(["わくわく", "興奮", "激アツ", "テンション", "excited", "amazing"]),
+}
+
+# Map each (lowercased) keyword to its mood and compile all of them into a
+# single case-insensitive alternation so content is scanned once, without
+# a lowercase copy and without a pass per keyword. Case folding is ASCII-only
+# so every match lowercases back to a key (Unicode folding would let "ſad"
+# match "sad")
+_KEYWORD_TO_MOOD = {word.lower(): mood for mood, words in MOOD_KEYWORDS.items() for word in words}
+_MOOD_PATTERN = re.compile(
+    "|".join(re.escape(word) for word in sorted(_KEYWORD_TO_MOOD, key=len, reverse=True)),
+    re.IGNORECASE | re.ASCII
+)
+
 
 class StreamContextService:
     """Manages stream contexts for different streams"""
@@ -19,7 +40,7 @@ class StreamContextService:
             max_message_history: Maximum number of messages to keep in history
         """
         self.max_message_history = max_message_history
-        self.stream_contexts: Dict[str, Dict[str, Any]] = {}
+        self.stream_contexts: Dict[str, StreamContext] = {}
         self.default_stream_id = "default"
         
         # Initialize default context
@@ -32,19 +53,11 @@ class StreamContextService:
         Args:
             stream_id: Stream ID
         """
-        self.stream_contexts[stream_id] = {
-            "title": "Test Stream",
-            "start_time": time.time(),
-            "duration": 0,
-            "topics": [],
-            "mood": "neutral",
-            "previous_messages": [],  # Store previous messages
-            "viewers": 0,             # Viewer count
-            "broadcaster_info": {},   # Broadcaster information
-            "message_count": 0        # Message count
-        }
+        self.stream_contexts[stream_id] = StreamContext(
+            previous_messages=deque(maxlen=self.max_message_history)
+        )
     
-    def get_context(self, stream_id: Optional[str] = None) -> Dict[str, Any]:
+    def get_context(self, stream_id: Optional[str] = None) -> StreamContext:
         """
         Get stream context
         
@@ -52,7 +65,7 @@ class StreamContextService:
             stream_id: Stream ID (default: default_stream_id)
             
         Returns:
-            dict: Stream context
+            StreamContext: Stream context
         """
         if stream_id is None:
             stream_id = self.default_stream_id
@@ -63,12 +76,12 @@ class StreamContextService:
         
         # Update duration
         ctx = self.stream_contexts[stream_id]
-        if ctx["start_time"]:
-            ctx["duration"] = time.time() - ctx["start_time"]
+        if ctx.start_time:
+            ctx.update_duration()
         
         return ctx
     
-    def update_title(self, title: str, stream_id: Optional[str] = None) -> Dict[str, Any]:
+    def update_title(self, title: str, stream_id: Optional[str] = None) -> StreamContext:
         """
         Update stream title
         
@@ -77,22 +90,18 @@ class StreamContextService:
             stream_id: Stream ID (default: default_stream_id)
             
         Returns:
-            dict: Updated stream context
+            StreamContext: Updated stream context
         """
         if stream_id is None:
             stream_id = self.default_stream_id
         
         ctx = self.get_context(stream_id)
-        ctx["title"] = title
-        
-        # Extract topics from title
-        keywords = [word.lower() for word in title.split() if len(word) > 2]
-        # Merge with existing topics, avoiding duplicates
-        ctx["topics"] = list(set(ctx["topics"] + keywords))
+        # Set the title and extract topics from it
+        ctx.set_title(title)
         
         return ctx
     
-    def add_message(self, message: str, stream_id: Optional[str] = None) -> Dict[str, Any]:
+    def add_message(self, message: str, stream_id: Optional[str] = None) -> StreamContext:
         """
         Add message to stream context
         
@@ -101,24 +110,19 @@ class StreamContextService:
             stream_id: Stream ID (default: default_stream_id)
             
         Returns:
-            dict: Updated stream context
+            StreamContext: Updated stream context
         """
         if stream_id is None:
             stream_id = self.default_stream_id
         
         ctx = self.get_context(stream_id)
         
-        # Increment message count
-        ctx["message_count"] += 1
-        
-        # Add message to history (keep last 10)
-        ctx["previous_messages"].append(message)
-        if len(ctx["previous_messages"]) > 10:
-            ctx["previous_messages"] = ctx["previous_messages"][-10:]
+        # Count the message and add it to the bounded history
+        ctx.add_message(message)
         
         return ctx
     
-    def update_viewers(self, count: int, stream_id: Optional[str] = None) -> Dict[str, Any]:
+    def update_viewers(self, count: int, stream_id: Optional[str] = None) -> StreamContext:
         """
         Update viewer count
         
@@ -127,17 +131,17 @@ class StreamContextService:
             stream_id: Stream ID (default: default_stream_id)
             
         Returns:
-            dict: Updated stream context
+            StreamContext: Updated stream context
         """
         if stream_id is None:
             stream_id = self.default_stream_id
         
         ctx = self.get_context(stream_id)
-        ctx["viewers"] = count
+        ctx.viewers = count
         
         return ctx
     
-    def reset_context(self, stream_id: Optional[str] = None) -> Dict[str, Any]:
+    def reset_context(self, stream_id: Optional[str] = None) -> StreamContext:
         """
         Reset stream context
         
@@ -145,7 +149,7 @@ class StreamContextService:
             stream_id: Stream ID (default: default_stream_id)
             
         Returns:
-            dict: New stream context
+            StreamContext: New stream context
         """
         if stream_id is None:
             stream_id = self.default_stream_id
@@ -154,7 +158,7 @@ class StreamContextService:
         
         return self.get_context(stream_id)
     
-    def analyze_mood(self, content: str, stream_id: Optional[str] = None) -> Dict[str, Any]:
+    def analyze_mood(self, content: str, stream_id: Optional[str] = None) -> StreamContext:
         """
         Analyze mood from content
         
@@ -163,35 +167,29 @@ class StreamContextService:
             stream_id: Stream ID (default: default_stream_id)
             
         Returns:
-            dict: Updated stream context
+            StreamContext: Updated stream context
         """
         if stream_id is None:
             stream_id = self.default_stream_id
         
         ctx = self.get_context(stream_id)
         
-        # Simple sentiment analysis
-        positive_words = ["楽しい", "嬉しい", "面白い", "すごい", "好き", "最高", "happy", "fun", "great"]
-        negative_words = ["難しい", "悲しい", "辛い", "苦しい", "嫌い", "最悪", "sad", "hard", "tough"]
-        excited_words = ["わくわく", "興奮", "激アツ", "テンション", "excited", "amazing"]
-        
-        content_lower = content.lower()
-        
-        # Count sentiment words
-        positive_count = sum([1 for word in positive_words if word in content_lower])
-        negative_count = sum([1 for word in negative_words if word in content_lower])
-        excited_count = sum([1 for word in excited_words if word in content_lower])
+        # Count distinct sentiment words in a single pass; only the short
+        # matches are lowercased, never the whole content
+        counts = {"positive": 0, "negative": 0, "excited": 0}
+        for word in {match.lower() for match in _MOOD_PATTERN.findall(content)}:
+            counts[_KEYWORD_TO_MOOD[word]] += 1
         
         # Determine mood
-        if excited_count > 0:
-            ctx["mood"] = "excited"
-        elif positive_count > negative_count:
-            ctx["mood"] = "positive"
-        elif negative_count > positive_count:
-            ctx["mood"] = "negative"
+        if counts["excited"] > 0:
+            ctx.mood = "excited"
+        elif counts["positive"] > counts["negative"]:
+            ctx.mood = "positive"
+        elif counts["negative"] > counts["positive"]:
+            ctx.mood = "negative"
         else:
             # Reset mood occasionally to avoid getting stuck
-            if ctx["message_count"] % 5 == 0:
-                ctx["mood"] = "neutral"
+            if ctx.message_count % 5 == 0:
+                ctx.mood = "neutral"
         
         return ctx
\ No newline at end of file
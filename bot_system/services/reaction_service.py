@@ -2,33 +2,213 @@
 Bot reaction generation service for Bot Listener System (Japanese version)
 ボットリスナーシステム用リアクション生成サービス（日本語版）
 """
+import asyncio
 import logging
 import random
-from typing import Dict, Any, List, Optional, Union
-from openai import AsyncOpenAI
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Any, List, Optional, Set, Tuple, Union
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 import os
 from dotenv import load_dotenv
 
+from bot_system.models.stream_context import StreamContext
+
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger("bot_listener")
 
+# OpenAI API呼び出しのタイムアウト（秒）。SDKの既定値（600秒）はライブ反応には長すぎる
+OPENAI_TIMEOUT = 30.0
+
+# 同じキーの反応を生成中に届いたリクエストをまとめるために待つ時間（秒）
+REACTION_BATCH_WINDOW = 0.02
+
+# AI反応の生成に失敗した場合の代替反応
+FALLBACK_RESPONSES = (
+    "面白いですね！",
+    "なるほど〜",
+    "へぇ、そうなんですね！",
+    "いいですね！",
+    "続きが気になります！"
+)
+
+# 記号・絵文字・「w」「草」「笑」だけの発言（正規化後）はAIを使わずに反応する
+TRIVIAL_PATTERN = re.compile(r"[\W_w草笑]+")
+
+# 個性ごとの短い定型反応（些細な発言への反応に使う）
+TRIVIAL_REACTIONS = {
+    "enthusiastic": ("わぁ！✨", "いいね！！", "盛り上がってる！🔥"),
+    "critical": ("ん？", "今のは？", "どういうこと？"),
+    "curious": ("なになに？", "え、何があったんですか？", "気になる！"),
+    "shy": ("w", "…笑", "（小声で）草"),
+    "funny": ("草ｗｗｗ", "腹筋崩壊ｗ", "ｗｗｗｗ"),
+    "technical": ("なるほど", "ふむ", "今の挙動、気になりますね"),
+    "supportive": ("いいですね😊", "楽しそう！", "がんばって！")
+}
+DEFAULT_TRIVIAL_REACTIONS = ("ｗｗｗ", "草", "いいね！")
+
+# バッチの生成が途中で失敗したことを待機キューに知らせる印（Noneは正常終了）
+_BATCH_FAILED = object()
+
+
+class ReactionInterrupted(Exception):
+    """反応の生成が途中で失敗した（それまでの差分は破棄し、代替反応を使う）"""
+    
+    def __init__(self, fallback: str):
+        """
+        Args:
+            fallback: 途中までの反応の代わりに使う代替反応
+        """
+        super().__init__("reaction stream interrupted")
+        self.fallback = fallback
+
+
+# キャッシュ照合時に無視する末尾の記号（「!」「〜」など）
+TRAILING_MARKS = "!?.。、,〜~ー… "
+
+# 個性ごとの反応の文字数制限
+CHARACTER_LIMITS = {
+    "enthusiastic": 60,
+    "critical": 70,
+    "curious": 60,
+    "shy": 30,
+    "funny": 60,
+    "technical": 80,
+    "supportive": 50
+}
+
+# 個性ごとの良い応答の例（プロンプトには該当する個性の例だけを入れる）
+EXAMPLE_REACTIONS = {
+    "enthusiastic": "わぁ！それすごいですね！次も楽しみにしてます！✨✨",
+    "critical": "そのやり方だと効率が悪くないですか？別の方法も検討してみては？",
+    "curious": "なぜその技術を選んだんですか？他の選択肢も考えたんですか？",
+    "shy": "なるほど...（小声で）",
+    "funny": "爆発しなくてよかったですね笑 私なら逃げ出してます🏃💨",
+    "technical": "そのアルゴリズムの計算量はO(n²)ですよね。並列化は検討されましたか？",
+    "supportive": "お疲れ様です！いつも素晴らしい配信をありがとう😊"
+}
+DEFAULT_EXAMPLE_REACTION = "へぇ、そうなんですね！続きが気になります！"
+
+# システムメッセージ冒頭の共通ルール（全ての配信・個性で同じ。プロンプトキャッシュが効くよう先頭に置く）
+SYSTEM_RULES = """あなたはライブ配信の日本人の視聴者ボットです。
+
+配信内容に対して、下記の個性に基づいた自然な反応を一行で返してください。
+実際の視聴者のように振る舞い、質問、感想、リアクション、絵文字などで反応してください。
+
+【避けるべき応答の例】
+- 不自然に長い文章
+- ボットっぽい定型文
+- 配信内容と無関係なコメント
+- 個性と合わない反応スタイル
+
+"""
+
+# システムメッセージ中盤（ボットの個性。同じ個性のボットで共通）のテンプレート
+SYSTEM_PERSONALITY_TEMPLATE = """【ボットの個性】
+- 個性タイプ: {personality}（{personality_desc}）
+- 興味のある分野: {interests}
+- 絵文字の使用: {emoji_desc}
+
+返答は{character_limit}文字以内に簡潔にしてください。
+
+【良い応答の例】
+- {example}
+
+"""
+
+# システムメッセージ後半（配信ごと・毎回変わる部分だけ）のテンプレート
+SYSTEM_CONTEXT_TEMPLATE = """【配信コンテキスト】
+- 配信タイトル: {title}
+- 配信への興味レベル: {interest_level}
+- 視聴者の態度: {viewer_attitude}
+- 配信時間: {minutes}分{seconds}秒
+{context_messages}
+- 今までの配信で出たトピック: {topics}
+"""
+
+
+@lru_cache(maxsize=512)
+def _build_system_prefix(
+    personality_type: str,
+    personality_desc: str,
+    interests: str,
+    emoji_desc: str
+) -> str:
+    """
+    共通ルールとボットの個性からなるシステムメッセージ前半を作成（同じ組み合わせはキャッシュ）
+    
+    Args:
+        personality_type: 個性タイプ
+        personality_desc: 個性の説明
+        interests: 興味のある分野
+        emoji_desc: 絵文字の使用頻度の説明
+    
+    Returns:
+        str: システムメッセージ前半
+    """
+    return SYSTEM_RULES + SYSTEM_PERSONALITY_TEMPLATE.format(
+        personality=personality_type,
+        personality_desc=personality_desc,
+        interests=interests,
+        emoji_desc=emoji_desc,
+        character_limit=CHARACTER_LIMITS.get(personality_type, 50),
+        example=EXAMPLE_REACTIONS.get(personality_type, DEFAULT_EXAMPLE_REACTION)
+    )
+
 
 class ReactionService:
     """ボットリアクション生成サービス"""
     
-    def __init__(self, openai_api_key: str, openai_model: str = "gpt-3.5-turbo"):
+    def __init__(
+        self,
+        openai_api_key: str,
+        openai_model: str = "gpt-3.5-turbo",
+        cache_size: int = 1024,
+        cache_ttl: float = 30.0,
+        max_concurrency: int = 16
+    ):
         """
         リアクションサービスの初期化
         
         Args:
             openai_api_key: OpenAI APIキー
             openai_model: 使用するOpenAIモデル
+            cache_size: キャッシュする反応の最大数
+            cache_ttl: キャッシュした反応の有効期間（秒）
+            max_concurrency: 同時に実行するOpenAI API呼び出しの最大数
         """
-        self.client = AsyncOpenAI(api_key=openai_api_key)
+        # HTTP/2でAPI呼び出しを少数の接続に多重化する
+        self.client = AsyncOpenAI(
+            api_key=openai_api_key,
+            timeout=OPENAI_TIMEOUT,
+            http_client=DefaultAsyncHttpxClient(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+            )
+        )
         self.model = openai_model
         
+        # 同じ内容・同じ個性への反応を短時間だけ再利用するLRUキャッシュ（有効期限, 反応）
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._reaction_cache: "OrderedDict[Tuple, Tuple[float, str]]" = OrderedDict()
+        
+        # 同じキーの同時リクエストを待ち合わせるバッチ（キーごとの待機キュー）
+        self._pending_batches: Dict[Tuple, List[asyncio.Queue]] = {}
+        self._batch_tasks: Set[asyncio.Task] = set()
+        
+        # キーごとの実行中バッチ数（同じキーが実行中の時だけ待ち合わせる）
+        self._active_batches: Dict[Tuple, int] = {}
+        
+        # レート制限に当たらないようにAPI呼び出しの同時実行数を制限
+        self._api_semaphore = asyncio.Semaphore(max_concurrency)
+        
         # 個性ごとの温度設定
         self.personality_temperatures = {
             "enthusiastic": 0.9,
@@ -58,9 +238,9 @@ class ReactionService:
             "low": "絵文字はあまり使わない（20%の確率で1つ）"
         }
     
-    async def generate_reaction(self, content: str, bot_info: dict, stream_context: dict = None) -> str:
+    async def generate_reaction(self, content: str, bot_info: dict, stream_context: Optional[StreamContext] = None) -> str:
         """
-        ストリームコンテンツに対するボットの反応を生成
+        ストリームコンテンツに対するボットの反応を生成（キャッシュ済みなら再利用）
         
         Args:
             content: ストリームコンテンツ
@@ -71,192 +251,326 @@ class ReactionService:
             str: 生成された反応
         """
         try:
-            # ボットの個性情報を抽出
-            personality_type = bot_info.get("personality_type", "standard")
-            interests = bot_info.get("interests", [])
-            emoji_usage = bot_info.get("emoji_usage", "medium")
-            
-            # interestsが配列の場合は文字列に変換
-            if isinstance(interests, list):
-                interests_str = ", ".join(interests)
-            else:
-                interests_str = str(interests)
-            
-            # 配信コンテキスト情報を構築
-            stream_title = "不明な配信"
-            stream_duration = 0
-            stream_topics = []
-            previous_messages = []
-            
-            if stream_context:
-                stream_title = stream_context.get("title", "不明な配信")
-                stream_duration = stream_context.get("duration", 0)
-                stream_topics = stream_context.get("topics", [])
-                previous_messages = stream_context.get("previous_messages", [])
-            
-            # Unicode問題を回避するためにASCII範囲外の文字をエスケープ
-            def sanitize_text(text):
-                if not isinstance(text, str):
-                    return str(text)
-                # ASCII範囲外の文字をエスケープまたは置換
-                return text.encode('ascii', 'backslashreplace').decode('ascii')
-            
-            # テキストデータをサニタイズ
-            sanitized_title = sanitize_text(stream_title)
-            sanitized_personality = sanitize_text(personality_type)
-            sanitized_interests = sanitize_text(interests_str)
-            
-            # 前回のメッセージコンテキスト（最大3つ）
-            context_messages = ""
-            if previous_messages:
-                for i, msg in enumerate(previous_messages[-3:]):
-                    sanitized_msg = sanitize_text(msg)
-                    context_messages += f"前回のメッセージ{i+1}: {sanitized_msg}\n"
-            
-            # 個性と絵文字の使用頻度の説明を取得
-            personality_desc = self.personality_descriptions.get(
-                sanitized_personality, 
-                "標準的な反応をする"
-            )
-            emoji_desc = self.emoji_descriptions.get(
-                emoji_usage, 
-                "絵文字を適度に使う"
-            )
-            
-            # 配信時間に応じた視聴者の態度
-            viewer_attitude = "初めて見た配信に興味を持っている"
-            if stream_duration > 1800:  # 30分以上
-                viewer_attitude = "しばらく視聴していて配信の流れを理解している"
-            elif stream_duration > 300:  # 5分以上
-                viewer_attitude = "少し視聴していて配信に慣れてきている"
+            parts = [delta async for delta in self.stream_reaction(content, bot_info, stream_context)]
+        except ReactionInterrupted as e:
+            return e.fallback
+        return "".join(parts).strip()
+    
+    async def stream_reaction(
+        self,
+        content: str,
+        bot_info: dict,
+        stream_context: Optional[StreamContext] = None
+    ) -> AsyncIterator[str]:
+        """
+        ボットの反応をトークン単位で順次返す（キャッシュ済みなら一括で返す）
+        
+        Args:
+            content: ストリームコンテンツ
+            bot_info: ボット情報
+            stream_context: ストリームコンテキスト
             
-            # 配信タイトルに基づく興味レベル
-            interest_level = "普通"
-            for interest in interests:
-                # 興味と配信タイトルに共通のキーワードがあるか確認
-                if isinstance(interest, str) and isinstance(stream_title, str):
-                    if interest.lower() in stream_title.lower():
-                        interest_level = "高い"
-                        break
-                    
-            # 文脈理解のためのヒストリーをより詳細に構築
-            context_messages = ""
-            if previous_messages:
-                # メッセージと発言者情報を含める
-                for i, msg_data in enumerate(previous_messages[-5:]):  # 5つまで拡大
-                    msg = msg_data.get("content", "")
-                    speaker = msg_data.get("speaker", "配信者")
-                    timestamp = msg_data.get("timestamp", 0)
-                    time_ago = int((stream_duration - timestamp) / 60) if timestamp > 0 else "?"
-                    
-                    sanitized_msg = sanitize_text(msg)
-                    sanitized_speaker = sanitize_text(speaker)
-                    
-                    context_messages += f"{time_ago}分前 - {sanitized_speaker}: {sanitized_msg}\n"
+        Yields:
+            str: 反応の差分テキスト（空のコンテンツには何も返さない）
+        
+        Raises:
+            ReactionInterrupted: 差分を返した後で生成に失敗した場合（代替反応を持つ）
+        """
+        # 空のコンテンツには反応しない（OpenAI APIも呼ばない）
+        if not content or content.isspace():
+            return
+        
+        # 記号や「w」だけの発言にはAPIを呼ばず、個性ごとの定型反応を返す
+        if is_trivial_content(content):
+            personality_type = str(bot_info.get("personality_type", "standard"))
+            yield random.choice(TRIVIAL_REACTIONS.get(personality_type, DEFAULT_TRIVIAL_REACTIONS))
+            return
+        
+        key = self._cache_key(content, bot_info, stream_context)
+        
+        # 有効期限内のキャッシュヒット時はOpenAI APIを呼ばない
+        cached = self._reaction_cache.get(key)
+        if cached is not None:
+            expires_at, reaction = cached
+            if expires_at > time.monotonic():
+                self._reaction_cache.move_to_end(key)
+                yield reaction
+                return
+            del self._reaction_cache[key]
+        
+        # 同じキーのバッチが待機中なら相乗りし、なければ新しく開始
+        batch = self._pending_batches.get(key)
+        if batch is None:
+            batch = []
+            self._pending_batches[key] = batch
+            # 単独のリクエストは待たずに開始し、同じキーの生成中に届いた分だけ少し待ってまとめる
+            window = REACTION_BATCH_WINDOW if self._active_batches.get(key) else 0
+            self._active_batches[key] = self._active_batches.get(key, 0) + 1
+            task = asyncio.create_task(self._run_batch(key, batch, window, content, bot_info, stream_context))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+        
+        queue: asyncio.Queue = asyncio.Queue()
+        batch.append(queue)
+        
+        received = False
+        while (delta := await queue.get()) is not None:
+            if delta is _BATCH_FAILED:
+                break
+            received = True
+            yield delta
+        else:
+            if received:
+                return
+        
+        # 生成に失敗した場合は代替反応を返す（キャッシュはしない）。
+        # 途中まで返していた場合は、途中の反応を確定させないよう例外で知らせる
+        fallback = random.choice(FALLBACK_RESPONSES)
+        if received:
+            raise ReactionInterrupted(fallback)
+        yield fallback
+    
+    async def _run_batch(
+        self,
+        key: Tuple,
+        batch: List[asyncio.Queue],
+        window: float,
+        content: str,
+        bot_info: dict,
+        stream_context: Optional[StreamContext] = None
+    ) -> None:
+        """
+        同じキーの反応リクエストをまとめて1回のAPI呼び出しで生成
+        
+        Args:
+            key: キャッシュキー
+            batch: 差分テキストを受け取るキューのリスト（Noneで正常終了、_BATCH_FAILEDで失敗）
+            window: リクエストが揃うまで待つ時間（秒）
+            content: ストリームコンテンツ
+            bot_info: ボット情報
+            stream_context: ストリームコンテキスト
+        """
+        try:
+            await self._generate_batch(key, batch, window, content, bot_info, stream_context)
+        finally:
+            count = self._active_batches.pop(key, 1) - 1
+            if count:
+                self._active_batches[key] = count
+    
+    async def _generate_batch(
+        self,
+        key: Tuple,
+        batch: List[asyncio.Queue],
+        window: float,
+        content: str,
+        bot_info: dict,
+        stream_context: Optional[StreamContext] = None
+    ) -> None:
+        """
+        待ち合わせたリクエストの反応を生成して各キューへ流す（引数は_run_batchと同じ）
+        """
+        try:
+            # 同時に届くリクエストが揃うまで待つ（0でも同じ周回に届いた分はまとまる）
+            await asyncio.sleep(window)
+        finally:
+            # 以降のリクエストは新しいバッチになる
+            self._pending_batches.pop(key, None)
+        
+        parts: List[List[str]] = [[] for _ in batch]
+        end = _BATCH_FAILED
+        try:
+            # 待機数ぶんの候補を1回で生成し、候補ごとに別のボットへ流す
+            async with self._api_semaphore:
+                async for index, delta in self._stream_reactions(content, bot_info, stream_context, n=len(batch)):
+                    if index < len(batch):
+                        parts[index].append(delta)
+                        batch[index].put_nowait(delta)
             
-            # キーワードと感情分析の追加
-            content_keywords = extract_keywords(content)
-            content_sentiment = analyze_sentiment(content)
+            # 最後まで生成できた反応だけをキャッシュする
+            reaction = "".join(parts[0]).strip() if parts else ""
+            if reaction:
+                self._reaction_cache[key] = (time.monotonic() + self.cache_ttl, reaction)
+                if len(self._reaction_cache) > self.cache_size:
+                    self._reaction_cache.popitem(last=False)
+            end = None
+        except Exception as e:
+            # タイムアウトや接続断などで途中終了した反応は確定させない
+            logger.error(f"AI反応生成エラー: {e}")
+        finally:
+            for queue in batch:
+                queue.put_nowait(end)
+    
+    def _cache_key(self, content: str, bot_info: dict, stream_context: Optional[StreamContext] = None) -> Tuple:
+        """
+        反応キャッシュのキーを作成（配信タイトルが変われば別のキーになる）
+        
+        Args:
+            content: ストリームコンテンツ
+            bot_info: ボット情報
+            stream_context: ストリームコンテキスト
             
-            # 個性に応じた文字数制限の設定
-            character_limits = {
-                "enthusiastic": 60,
-                "critical": 70,
-                "curious": 60,
-                "shy": 30,
-                "funny": 60,
-                "technical": 80,
-                "supportive": 50
-            }
-            character_limit = character_limits.get(sanitized_personality, 50)
+        Returns:
+            tuple: キャッシュキー
+        """
+        interests = bot_info.get("interests", [])
+        if isinstance(interests, list):
+            interests = tuple(sorted(str(interest) for interest in interests))
+        else:
+            interests = str(interests)
+        
+        return (
+            normalize_content(content),
+            stream_context.title if stream_context else "",
+            str(bot_info.get("personality_type", "standard")),
+            interests,
+            str(bot_info.get("emoji_usage", "medium"))
+        )
+    
+    async def _stream_reactions(
+        self,
+        content: str,
+        bot_info: dict,
+        stream_context: Optional[StreamContext] = None,
+        n: int = 1
+    ) -> AsyncIterator[Tuple[int, str]]:
+        """
+        OpenAI APIでストリームコンテンツに対するボットの反応をストリーミング生成
+        
+        Args:
+            content: ストリームコンテンツ
+            bot_info: ボット情報
+            stream_context: ストリームコンテキスト
+            n: 生成する反応の候補数
             
-            # システムメッセージを構築
-            system_message = f"""あなたはライブ配信「{sanitized_title}」の日本人の視聴者ボットです。
-
-【ボットの個性】
-- 個性タイプ: {sanitized_personality}（{personality_desc}）
-- 興味のある分野: {sanitized_interests}
-- 絵文字の使用: {emoji_desc}
-- 配信への興味レベル: {interest_level}
-- 視聴者の態度: {viewer_attitude}
-
-【配信コンテキスト】
-- 配信タイトル: {sanitized_title}
-- 配信時間: {int(stream_duration/60)}分{int(stream_duration%60)}秒
-{context_messages}
-- 今までの配信で出たトピック: {", ".join(stream_topics) if stream_topics else "まだ特定されていません"}
-
-配信内容に対して、上記の個性に基づいた自然な反応を一行で返してください。
-実際の視聴者のように振る舞い、質問、感想、リアクション、絵文字などで反応してください。
-返答は{character_limit}文字以内に簡潔にしてください。
-
-【良い応答の例】
-- enthusiastic: わぁ！それすごいですね！次も楽しみにしてます！✨✨
-- critical: そのやり方だと効率が悪くないですか？別の方法も検討してみては？
-- curious: なぜその技術を選んだんですか？他の選択肢も考えたんですか？
-- shy: なるほど...（小声で）
-- funny: 爆発しなくてよかったですね笑 私なら逃げ出してます🏃💨
-- technical: そのアルゴリズムの計算量はO(n²)ですよね。並列化は検討されましたか？
-- supportive: お疲れ様です！いつも素晴らしい配信をありがとう😊
-
-【避けるべき応答の例】
-- 不自然に長い文章
-- ボットっぽい定型文
-- 配信内容と無関係なコメント
-- 個性と合わない反応スタイル
-
-"""
+        Yields:
+            Tuple[int, str]: 候補番号と差分テキスト
+        
+        Raises:
+            Exception: API呼び出しやストリームの受信に失敗した場合（タイムアウトを含む）
+        """
+        # ボットの個性情報を抽出
+        personality_type = bot_info.get("personality_type", "standard")
+        interests = bot_info.get("interests", [])
+        emoji_usage = bot_info.get("emoji_usage", "medium")
+        
+        # interestsが配列の場合は文字列に変換
+        if isinstance(interests, list):
+            interests_str = ", ".join(interests)
+        else:
+            interests_str = str(interests)
+        
+        # 配信コンテキスト情報を構築
+        stream_title = "不明な配信"
+        stream_title_lower = stream_title
+        stream_duration = 0
+        stream_topics = []
+        context_messages = ""
+        
+        if stream_context:
+            stream_title = stream_context.title
+            stream_title_lower = stream_context.title_lower
+            stream_duration = stream_context.duration
+            stream_topics = stream_context.topics
+            # 直近の発言はメッセージ受信時に整形済みなので連結するだけ
+            context_messages = "\n".join(stream_context.rendered_messages)
+        
+        # テキストデータを文字列に揃える（UTF-8のままOpenAIに渡す）
+        stream_title = str(stream_title)
+        personality_type = str(personality_type)
+        
+        # 個性と絵文字の使用頻度の説明を取得
+        personality_desc = self.personality_descriptions.get(
+            personality_type, 
+            "標準的な反応をする"
+        )
+        emoji_desc = self.emoji_descriptions.get(
+            emoji_usage, 
+            "絵文字を適度に使う"
+        )
+        
+        # 配信時間に応じた視聴者の態度
+        viewer_attitude = "初めて見た配信に興味を持っている"
+        if stream_duration > 1800:  # 30分以上
+            viewer_attitude = "しばらく視聴していて配信の流れを理解している"
+        elif stream_duration > 300:  # 5分以上
+            viewer_attitude = "少し視聴していて配信に慣れてきている"
+        
+        # 配信タイトルに基づく興味レベル
+        # （小文字化したタイトルはタイトル更新時にコンテキストで作成済み）
+        interest_level = "普通"
+        for interest in interests:
+            # 興味と配信タイトルに共通のキーワードがあるか確認
+            if isinstance(interest, str) and interest.lower() in stream_title_lower:
+                interest_level = "高い"
+                break
+        
+        # 配信時間を分と秒に分解（1回の割り算で済ませる）
+        minutes, seconds = divmod(int(stream_duration), 60)
+        
+        # システムメッセージを構築
+        system_message = _build_system_prefix(
+            personality_type,
+            personality_desc,
+            interests_str,
+            emoji_desc
+        ) + SYSTEM_CONTEXT_TEMPLATE.format(
+            title=stream_title,
+            interest_level=interest_level,
+            viewer_attitude=viewer_attitude,
+            minutes=minutes,
+            seconds=seconds,
+            context_messages=context_messages,
+            topics=", ".join(stream_topics) if stream_topics else "まだ特定されていません"
+        )
 
-            # 配信内容もサニタイズ
-            sanitized_content = sanitize_text(content)
-            
-            # 個性に応じた温度の設定
-            personality_type = bot_info.get("personality_type", "standard")
-            temperature = self.personality_temperatures.get(personality_type, 0.7)
-            
-            # OpenAI APIを呼び出し
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": f"配信内容: {sanitized_content}\n\n視聴者としての自然な反応を一行で書いてください。"}
-                ],
-                max_tokens=100,  # 少し増やして十分な長さを確保
-                temperature=temperature,  # 個性に基づいて調整
-                presence_penalty=0.6,  # 繰り返しを減らす
-                frequency_penalty=0.5  # バリエーションを増やす
-            )
-            
-            return response.choices[0].message.content.strip()
+        # 個性に応じた温度の設定
+        personality_type = bot_info.get("personality_type", "standard")
+        temperature = self.personality_temperatures.get(personality_type, 0.7)
         
-        except Exception as e:
-            logger.error(f"AI反応生成エラー: {e}")
+        # OpenAI APIを呼び出し
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": f"配信内容: {content}\n\n視聴者としての自然な反応を一行で書いてください。"}
+            ],
+            n=n,  # 同じ個性のボットの数だけ候補を生成
+            max_tokens=100,  # 少し増やして十分な長さを確保
+            temperature=temperature,  # 個性に基づいて調整
+            presence_penalty=0.6,  # 繰り返しを減らす
+            frequency_penalty=0.5,  # バリエーションを増やす
+            stream=True  # 最初のトークンからすぐに転送する
+        )
+        
+        async for chunk in response:
+            for choice in chunk.choices:
+                if choice.delta.content:
+                    yield choice.index, choice.delta.content
 
-def extract_keywords(text):
-    """簡単なキーワード抽出（実装例）"""
-    # 実際の実装ではMeCab等の形態素解析ライブラリを使用することを推奨
-    common_words = ["です", "ます", "した", "から", "ので", "けど", "って", "など"]
-    words = text.split()
-    keywords = []
+def normalize_content(text: str) -> str:
+    """
+    キャッシュ照合用にコンテンツを正規化（表記ゆれだけが違う発言を同じ反応で扱う）
     
-    for word in words:
-        if len(word) > 1 and word not in common_words:
-            keywords.append(word)
-    
-    return keywords[:5]  # 最大5つのキーワードを返す
+    Args:
+        text: ストリームコンテンツ
+        
+    Returns:
+        str: 正規化したコンテンツ
+    """
+    # 全角/半角の統一、大文字小文字の無視、空白の詰め、末尾の記号の除去
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(text.split()).rstrip(TRAILING_MARKS)
 
-def analyze_sentiment(text):
-    """簡易的な感情分析（実装例）"""
-    # 実際の実装では感情分析APIや辞書ベースの分析を推奨
-    positive_words = ["嬉しい", "楽しい", "素晴らしい", "好き", "良い", "すごい"]
-    negative_words = ["悲しい", "つらい", "難しい", "嫌い", "悪い", "残念"]
+def is_trivial_content(text: str) -> bool:
+    """
+    記号・絵文字・「w」「草」「笑」だけの、AIで反応するまでもない発言か判定
     
-    positive_count = sum(1 for word in positive_words if word in text)
-    negative_count = sum(1 for word in negative_words if word in text)
-    
-    if positive_count > negative_count:
-        return "ポジティブ"
-    elif negative_count > positive_count:
-        return "ネガティブ"
-    else:
-        return "中立"
\ No newline at end of file
+    Args:
+        text: ストリームコンテンツ
+        
+    Returns:
+        bool: 些細な発言ならTrue
+    """
+    normalized = normalize_content(text)
+    # 末尾の記号を除いて空になる発言（「!!!」など）も些細な発言として扱う
+    return not normalized or TRIVIAL_PATTERN.fullmatch(normalized) is not None
@@ -3,7 +3,7 @@
 Bot Listener System Test Clients
 -------------------------------
 * Python 3.9+ recommended
-* Dependencies: websockets, argparse, colorama
+* Dependencies: websockets, argparse, colorama, orjson, uvloop (optional)
 * Usage:
   - Broadcaster client: python test_clients.py broadcaster
   - Bot viewer client: python test_clients.py bot-viewer
@@ -16,13 +16,22 @@ import os
 import argparse
 import websockets
 import json
+import orjson
 import time
+import threading
 import uuid
 import random
-from typing import List, Dict, Any, Optional
+from collections import deque
+from typing import Callable, Deque, List, Dict, Any, Optional, Set
 import logging
 from colorama import init, Fore, Style
 
+# uvloop is faster for many concurrent sockets; not available on Windows
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Initialize colorama for cross-platform colored output
 init()
 
@@ -33,6 +42,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger("bot_client")
 
+# Available personality types
+PERSONALITY_TYPES = ["enthusiastic", "critical", "curious", "shy", "funny", "technical", "supportive"]
+
+# Available interest sets
+INTEREST_SETS = [
+    ["Technology", "Games", "Music"],
+    ["Anime", "Manga", "Movies"],
+    ["Programming", "AI", "Machine Learning"],
+    ["Sports", "Health", "Cooking"],
+    ["Science", "Space", "History"]
+]
+
+# Emoji usage levels
+EMOJI_USAGE_LEVELS = ["high", "medium", "low"]
+
+# Outbound messages buffered per bot, and how many may share one frame
+BOT_QUEUE_SIZE = 256
+MAX_MERGED_MESSAGES = 32
+
+# Seconds between bot heartbeats
+HEARTBEAT_INTERVAL = 30
+
+# Multi-bot mode: concurrent handshakes and per-bot connect stagger (seconds)
+MAX_CONCURRENT_CONNECTS = 64
+CONNECT_JITTER = 0.01
+
+# Multi-bot mode: console lines buffered between flushes, and flush interval (seconds)
+OUTPUT_BUFFER_SIZE = 10_000
+OUTPUT_FLUSH_INTERVAL = 1.0
+
+# Buffered multi-bot console output (oldest lines drop when full)
+_output: Deque[str] = deque(maxlen=OUTPUT_BUFFER_SIZE)
+
+
+def buffered_print(text: str) -> None:
+    """
+    Queue a console line for the next periodic flush
+    
+    Args:
+        text: Line to print
+    """
+    _output.append(text)
+
+
+def flush_output() -> None:
+    """Write all buffered console lines in a single call"""
+    if _output:
+        lines = list(_output)
+        _output.clear()
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+
+
+async def flush_output_periodically():
+    """Flush buffered console output once per interval"""
+    while True:
+        await asyncio.sleep(OUTPUT_FLUSH_INTERVAL)
+        flush_output()
+
 
 class BroadcasterClient:
     """Broadcaster client for Bot Listener System"""
@@ -58,7 +126,8 @@ class BroadcasterClient:
         
         print(f"{Fore.GREEN}🎬 Stream title: {self.stream_title}{Style.RESET_ALL}")
         
-        async with websockets.connect(self.uri) as ws:
+        # Small JSON frames gain nothing from permessage-deflate
+        async with websockets.connect(self.uri, compression=None) as ws:
             print(f"{Fore.GREEN}✅ Connected as broadcaster to: {self.uri}{Style.RESET_ALL}")
             print(f"{Fore.CYAN}👉 Enter stream content and press Enter. Ctrl+D / Ctrl+C to exit.{Style.RESET_ALL}")
             print(f"{Fore.YELLOW}💡 Commands: /title <new title> (change title), /viewers (check viewer count){Style.RESET_ALL}\n")
@@ -85,7 +154,7 @@ class BroadcasterClient:
             async for msg in ws:
                 try:
                     # Parse JSON response
-                    data = json.loads(msg)
+                    data = orjson.loads(msg)
                     
                     # Display bot reactions
                     if data.get("type") == "bot_reaction":
@@ -112,7 +181,7 @@ class BroadcasterClient:
                         if os.environ.get("DEBUG") == "1":
                             print(f"\r{Fore.WHITE}🔄 Received: {json.dumps(data, ensure_ascii=False, indent=2)}{Style.RESET_ALL}\n> ", end="", flush=True)
                 
-                except json.JSONDecodeError:
+                except orjson.JSONDecodeError:
                     print(f"\r{Fore.WHITE}🔄 Received: {msg}{Style.RESET_ALL}\n> ", end="", flush=True)
         
         except websockets.ConnectionClosedOK:
@@ -121,6 +190,19 @@ class BroadcasterClient:
         except Exception as e:
             print(f"\n{Fore.RED}❌ Error: {str(e)}{Style.RESET_ALL}")
     
+    @staticmethod
+    def _stdin_pump(loop: asyncio.AbstractEventLoop, lines: asyncio.Queue):
+        """
+        Read stdin on a dedicated thread and hand lines to the event loop
+        
+        Args:
+            loop: Event loop that owns the queue
+            lines: Queue receiving lines, then "" on EOF
+        """
+        for line in sys.stdin:
+            loop.call_soon_threadsafe(lines.put_nowait, line)
+        loop.call_soon_threadsafe(lines.put_nowait, "")
+    
     async def _send_messages(self, ws: websockets.WebSocketClientProtocol):
         """
         Send messages from user input
@@ -128,12 +210,18 @@ class BroadcasterClient:
         Args:
             ws: WebSocket connection
         """
-        loop = asyncio.get_running_loop()
+        # One long-lived reader thread feeds stdin lines into the loop
+        lines: asyncio.Queue = asyncio.Queue()
+        threading.Thread(
+            target=self._stdin_pump,
+            args=(asyncio.get_running_loop(), lines),
+            daemon=True
+        ).start()
         
         try:
             while True:
                 # Get user input
-                line = await loop.run_in_executor(None, sys.stdin.readline)
+                line = await lines.get()
                 if not line:  # EOF (Ctrl+D)
                     break
                 
@@ -148,7 +236,7 @@ class BroadcasterClient:
                 
                 elif line.strip() == "/viewers":
                     # Viewer count command
-                    await ws.send(json.dumps({"command": "get_viewers"}, ensure_ascii=True))
+                    await ws.send(orjson.dumps({"command": "get_viewers"}).decode())
                     continue
                 
                 # Prepare stream data with metadata
@@ -164,35 +252,81 @@ class BroadcasterClient:
                 }
                 
                 # Send to server
-                await ws.send(json.dumps(stream_data, ensure_ascii=True))
+                await ws.send(orjson.dumps(stream_data).decode())
                 print("> ", end="", flush=True)
         
         except KeyboardInterrupt:
             pass
 
 
+def build_personality(bot_id: str, personality_type: str, interests: List[str], emoji_usage: str) -> Dict[str, Any]:
+    """
+    Build a bot personality
+    
+    Args:
+        bot_id: Bot ID
+        personality_type: Personality type
+        interests: Interest set
+        emoji_usage: Emoji usage level
+        
+    Returns:
+        Dict[str, Any]: Bot personality
+    """
+    return {
+        "id": bot_id,
+        "name": f"BotViewer_{bot_id[:6]}",
+        "personality_type": personality_type,
+        "interests": interests,
+        "emoji_usage": emoji_usage
+    }
+
+
 class BotViewerClient:
     """Bot viewer client for Bot Listener System"""
     
-    def __init__(self, uri: str, bot_id: Optional[str] = None):
+    def __init__(
+        self,
+        uri: str,
+        bot_id: Optional[str] = None,
+        output: Callable[[str], None] = print,
+        personality: Optional[Dict[str, Any]] = None
+    ):
         """
         Initialize bot viewer client
         
         Args:
             uri: WebSocket URI
             bot_id: Bot ID (optional)
+            output: Console line printer (buffered_print in multi-bot mode)
+            personality: Pre-generated bot personality (optional, random if omitted)
         """
         self.uri = uri
         self.bot_id = bot_id or str(uuid.uuid4())
+        self.output = output
         
-        # Generate random bot personality
-        self.personality = self._generate_personality()
+        # Handlers for server messages, keyed by message type (others, such as
+        # reaction_delta, go to _show_message; the full reaction follows deltas)
+        self._handlers = {
+            "stream_content": self._on_stream_content,
+            "reaction": self._on_reaction
+        }
+        
+        # Outbound messages, drained by a single writer task (created in run)
+        self.out_queue: Optional[asyncio.Queue] = None
+        
+        # Generate random bot personality unless one was supplied
+        self.personality = personality or self._generate_personality()
+        
+        # The personality never changes, so its JSON is encoded once per bot
+        bot_info_json = orjson.dumps(self.personality)
+        self._heartbeat_frame = b'{"type":"heartbeat","bot_info":' + bot_info_json + b'}'
+        self._request_prefix = b'{"type":"receive_stream_content","bot_info":' + bot_info_json + b',"content":'
         
         # Print bot info
         personality_type = self.personality["personality_type"]
         interests = ", ".join(self.personality["interests"])
         emoji_usage = self.personality["emoji_usage"]
-        print(f"{Fore.CYAN}🤖 Bot personality: {personality_type}, Interests: {interests}, Emoji usage: {emoji_usage}{Style.RESET_ALL}")
+        self.output(f"{Fore.CYAN}🤖 Bot personality: {personality_type}, Interests: {interests}, Emoji usage: {emoji_usage}{Style.RESET_ALL}")
     
     def _generate_personality(self) -> Dict[str, Any]:
         """
@@ -201,104 +335,188 @@ class BotViewerClient:
         Returns:
             Dict[str, Any]: Bot personality
         """
-        # Available personality types
-        personality_types = ["enthusiastic", "critical", "curious", "shy", "funny", "technical", "supportive"]
-        
-        # Available interest sets
-        interests = [
-            ["Technology", "Games", "Music"],
-            ["Anime", "Manga", "Movies"],
-            ["Programming", "AI", "Machine Learning"],
-            ["Sports", "Health", "Cooking"],
-            ["Science", "Space", "History"]
-        ]
+        # Generate random personality
+        return build_personality(
+            self.bot_id,
+            random.choice(PERSONALITY_TYPES),
+            random.choice(INTEREST_SETS),
+            random.choice(EMOJI_USAGE_LEVELS)
+        )
+    
+    async def _connect(self, connect_limit: Optional[asyncio.Semaphore] = None):
+        """
+        Open the WebSocket connection
         
-        # Emoji usage levels
-        emoji_usage = ["high", "medium", "low"]
+        Args:
+            connect_limit: Semaphore bounding concurrent handshakes (optional)
+        """
+        # Small JSON frames gain nothing from permessage-deflate
+        if connect_limit is None:
+            return await websockets.connect(self.uri, compression=None)
         
-        # Generate random personality
-        return {
-            "id": self.bot_id,
-            "name": f"BotViewer_{self.bot_id[:6]}",
-            "personality_type": random.choice(personality_types),
-            "interests": random.choice(interests),
-            "emoji_usage": random.choice(emoji_usage)
-        }
+        # Only the handshake holds the semaphore, not the whole session
+        async with connect_limit:
+            return await websockets.connect(self.uri, compression=None)
     
-    async def run(self):
-        """Run bot viewer client"""
-        async with websockets.connect(self.uri) as ws:
-            print(f"{Fore.GREEN}✅ Connected as bot viewer to: {self.uri}{Style.RESET_ALL}")
-            print(f"{Fore.CYAN}Waiting for stream content... (Ctrl+C to exit){Style.RESET_ALL}\n")
+    async def run(
+        self,
+        connect_limit: Optional[asyncio.Semaphore] = None,
+        live_bots: Optional[Set["BotViewerClient"]] = None
+    ):
+        """
+        Run bot viewer client
+        
+        Args:
+            connect_limit: Semaphore bounding concurrent handshakes (optional)
+            live_bots: Set of connected bots served by a shared heartbeat scheduler
+                (optional, the bot sends its own heartbeats if omitted)
+        """
+        async with await self._connect(connect_limit) as ws:
+            self.output(f"{Fore.GREEN}✅ Connected as bot viewer to: {self.uri}{Style.RESET_ALL}")
+            self.output(f"{Fore.CYAN}Waiting for stream content... (Ctrl+C to exit){Style.RESET_ALL}\n")
+            
+            # Start writer task and announce the bot right away
+            self.out_queue = asyncio.Queue(maxsize=BOT_QUEUE_SIZE)
+            writer_task = asyncio.create_task(self._write_messages(ws))
+            self.queue_heartbeat()
             
-            # Start heartbeat task
-            heartbeat_task = asyncio.create_task(self._send_heartbeat(ws))
+            # Later heartbeats come from a shared scheduler or this bot's own task
+            heartbeat_task = None
+            if live_bots is None:
+                heartbeat_task = asyncio.create_task(self._send_heartbeat())
+            else:
+                live_bots.add(self)
             
             try:
                 # Receive and process messages
                 async for msg in ws:
                     try:
                         # Parse received message
-                        data = json.loads(msg)
-                        
-                        # Handle stream content
-                        if "type" in data and data["type"] == "stream_content":
-                            print(f"\r{Fore.YELLOW}📺 Stream content: {data['content']}{Style.RESET_ALL}")
-                            
-                            # Send AI generation request
-                            ai_request = {
-                                "type": "receive_stream_content",
-                                "content": data['content'],
-                                "bot_info": self.personality,
-                                "timestamp": time.time()
-                            }
-                            
-                            # Send request
-                            await ws.send(json.dumps(ai_request, ensure_ascii=True))
-                            print(f"{Fore.BLUE}🔄 Sent AI generation request...{Style.RESET_ALL}")
-                        
-                        # Handle AI-generated reaction
-                        elif "type" in data and data["type"] == "reaction" and data.get("ai_generated", False):
-                            print(f"{Fore.GREEN}🤖 AI-generated reaction: {data['content']}{Style.RESET_ALL}")
-                        
-                        # Handle other messages
-                        else:
-                            print(f"\r{Fore.WHITE}📩 Received: {json.dumps(data, ensure_ascii=False, indent=2)}{Style.RESET_ALL}")
+                        data = orjson.loads(msg)
+                    except orjson.JSONDecodeError:
+                        self.output(f"\r{Fore.WHITE}📩 Received: {msg}{Style.RESET_ALL}")
+                        continue
                     
-                    except json.JSONDecodeError:
-                        print(f"\r{Fore.WHITE}📩 Received: {msg}{Style.RESET_ALL}")
+                    # The server merges queued messages into a JSON array
+                    for item in data if isinstance(data, list) else [data]:
+                        await self._handle_message(item)
             
             except websockets.ConnectionClosedOK:
-                print(f"\n{Fore.YELLOW}👋 Server closed the connection.{Style.RESET_ALL}")
+                self.output(f"\n{Fore.YELLOW}👋 Server closed the connection.{Style.RESET_ALL}")
             
             except KeyboardInterrupt:
                 pass
             
-            # Clean up
-            heartbeat_task.cancel()
-            await ws.close()
-            print(f"\n{Fore.RED}🔌 Disconnected.{Style.RESET_ALL}")
+            finally:
+                # Clean up even when the connection drops with an error
+                if heartbeat_task is None:
+                    live_bots.discard(self)
+                else:
+                    heartbeat_task.cancel()
+                writer_task.cancel()
+                await ws.close()
+                self.output(f"\n{Fore.RED}🔌 Disconnected.{Style.RESET_ALL}")
     
-    async def _send_heartbeat(self, ws: websockets.WebSocketClientProtocol):
+    async def _write_messages(self, ws: websockets.WebSocketClientProtocol):
         """
-        Send periodic heartbeat messages
+        Send queued JSON messages, merging any backlog into one JSON array frame
         
         Args:
             ws: WebSocket connection
         """
         while True:
+            messages = [await self.out_queue.get()]
+            while len(messages) < MAX_MERGED_MESSAGES and not self.out_queue.empty():
+                messages.append(self.out_queue.get_nowait())
+            
+            # A lone message is sent as-is so the server keeps its heartbeat fast path
+            payload = messages[0] if len(messages) == 1 else b"[" + b",".join(messages) + b"]"
             try:
-                # Send heartbeat with bot info
-                await ws.send(json.dumps({
-                    "type": "heartbeat", 
-                    "bot_info": self.personality
-                }, ensure_ascii=True))
-                
-                # Wait for next heartbeat
-                await asyncio.sleep(30)  # 30 seconds between heartbeats
-            except Exception:
-                # Stop on any error
+                await ws.send(payload.decode())
+            except websockets.ConnectionClosed:
                 break
+    
+    async def _handle_message(self, data: Dict[str, Any]):
+        """
+        Handle a single message from the server
+        
+        Args:
+            data: Parsed message
+        """
+        # Dispatch on message type with a single lookup
+        handler = self._handlers.get(data.get("type"))
+        if handler is None:
+            self._show_message(data)
+        else:
+            await handler(data)
+    
+    async def _on_stream_content(self, data: Dict[str, Any]):
+        """
+        Handle stream content by requesting an AI reaction
+        
+        Args:
+            data: Stream content message
+        """
+        self.output(f"\r{Fore.YELLOW}📺 Stream content: {data['content']}{Style.RESET_ALL}")
+        
+        # Send AI generation request (only content and timestamp are encoded per message)
+        ai_request = (
+            self._request_prefix + orjson.dumps(data['content'])
+            + b',"timestamp":' + orjson.dumps(time.time()) + b'}'
+        )
+        
+        # Send request
+        await self.out_queue.put(ai_request)
+        self.output(f"{Fore.BLUE}🔄 Sent AI generation request...{Style.RESET_ALL}")
+    
+    async def _on_reaction(self, data: Dict[str, Any]):
+        """
+        Handle a reaction
+        
+        Args:
+            data: Reaction message
+        """
+        if data.get("ai_generated", False):
+            self.output(f"{Fore.GREEN}🤖 AI-generated reaction: {data['content']}{Style.RESET_ALL}")
+        else:
+            self._show_message(data)
+    
+    def _show_message(self, data: Dict[str, Any]):
+        """
+        Print any other message (only in debug mode, as for the broadcaster)
+        
+        Args:
+            data: Parsed message
+        """
+        if os.environ.get("DEBUG") == "1":
+            self.output(f"\r{Fore.WHITE}📩 Received: {json.dumps(data, ensure_ascii=False, indent=2)}{Style.RESET_ALL}")
+    
+    def queue_heartbeat(self):
+        """Queue a heartbeat with bot info (skipped if the outbound queue is full)"""
+        try:
+            self.out_queue.put_nowait(self._heartbeat_frame)
+        except asyncio.QueueFull:
+            pass
+    
+    async def _send_heartbeat(self):
+        """Queue periodic heartbeat messages"""
+        while True:
+            # Wait for next heartbeat
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            self.queue_heartbeat()
+
+
+async def send_heartbeats(live_bots: Set[BotViewerClient]):
+    """
+    Queue heartbeats for every connected bot from a single timer
+    
+    Args:
+        live_bots: Set of connected bots
+    """
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        for bot in list(live_bots):
+            bot.queue_heartbeat()
 
 
 async def run_multiple_bots(uri: str, num_bots: int):
@@ -311,17 +529,43 @@ async def run_multiple_bots(uri: str, num_bots: int):
     """
     print(f"{Fore.GREEN}✅ Simulating {num_bots} bot viewers...{Style.RESET_ALL}")
     
+    # Bound concurrent handshakes so N bots don't storm the server at once
+    connect_limit = asyncio.Semaphore(MAX_CONCURRENT_CONNECTS)
+    
+    # One timer drives every bot's heartbeat instead of one task per bot
+    live_bots: Set[BotViewerClient] = set()
+    
+    async def run_bot(bot: BotViewerClient, delay: float):
+        # Stagger connects so handshakes arrive spread out
+        await asyncio.sleep(delay)
+        try:
+            await bot.run(connect_limit, live_bots)
+        except (websockets.WebSocketException, OSError) as e:
+            # A rejected or dropped bot (e.g. past MAX_BOT_VIEWERS) must not stop the others
+            buffered_print(f"{Fore.RED}❌ {bot.bot_id}: connection failed: {e}{Style.RESET_ALL}")
+    
+    # Draw every bot's traits up front, one batch per trait
+    personality_types = random.choices(PERSONALITY_TYPES, k=num_bots)
+    interest_sets = random.choices(INTEREST_SETS, k=num_bots)
+    emoji_levels = random.choices(EMOJI_USAGE_LEVELS, k=num_bots)
+    
+    # One suffix per run; the bot number keeps IDs unique within it
+    run_suffix = uuid.uuid4().hex[:6]
+    
     # Create tasks for each bot
     tasks = []
     for i in range(num_bots):
         # Create unique URI with bot ID
         bot_uri = f"{uri}?bot_id={i+1}"
-        bot_id = f"bot_{i+1}_{uuid.uuid4().hex[:6]}"
+        bot_id = f"bot_{i+1}_{run_suffix}"
+        personality = build_personality(bot_id, personality_types[i], interest_sets[i], emoji_levels[i])
         
-        # Create and run bot
-        bot = BotViewerClient(bot_uri, bot_id)
-        tasks.append(asyncio.create_task(bot.run()))
+        # Create and run bot (per-message lines are flushed in bulk)
+        bot = BotViewerClient(bot_uri, bot_id, output=buffered_print, personality=personality)
+        tasks.append(asyncio.create_task(run_bot(bot, i * CONNECT_JITTER)))
     
+    flusher = asyncio.create_task(flush_output_periodically())
+    heartbeats = asyncio.create_task(send_heartbeats(live_bots))
     try:
         # Wait for all bots to complete
         await asyncio.gather(*tasks)
@@ -332,7 +576,23 @@ async def run_multiple_bots(uri: str, num_bots: int):
         
         # Wait for tasks to cancel
         await asyncio.gather(*tasks, return_exceptions=True)
-        print(f"\n{Fore.RED}🔌 All bots disconnected.{Style.RESET_ALL}")
+        buffered_print(f"\n{Fore.RED}🔌 All bots disconnected.{Style.RESET_ALL}")
+    finally:
+        heartbeats.cancel()
+        flusher.cancel()
+        flush_output()
+
+
+def run_async(coro):
+    """
+    Run a coroutine on uvloop when installed, else on the default event loop
+    
+    Args:
+        coro: Coroutine to run
+    """
+    if uvloop is not None:
+        return uvloop.run(coro)
+    return asyncio.run(coro)
 
 
 def main():
@@ -363,18 +623,18 @@ def main():
         full_uri = f"{args.uri}broadcaster"
         # Create and run broadcaster client
         broadcaster = BroadcasterClient(full_uri)
-        asyncio.run(broadcaster.run())
+        run_async(broadcaster.run())
     
     elif args.client_type == "bot-viewer":
         full_uri = f"{args.uri}bot-viewer"
         # Create and run bot viewer client
         bot_viewer = BotViewerClient(full_uri)
-        asyncio.run(bot_viewer.run())
+        run_async(bot_viewer.run())
     
     elif args.client_type == "multi-bot":
         full_uri = f"{args.uri}bot-viewer"
         # Run multiple bot viewers
-        asyncio.run(run_multiple_bots(full_uri, args.bots))
+        run_async(run_multiple_bots(full_uri, args.bots))
 
 
 if __name__ == "__main__":
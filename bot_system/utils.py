@@ -1,31 +1,25 @@
 """
 Utility functions for Bot Listener System
 """
-import json
-import time
-from typing import Dict, Any, List, Optional, Union
+import re
+from typing import List
 import logging
-import random
 import asyncio
 
 logger = logging.getLogger("bot_listener")
 
-
-def sanitize_text(text: Union[str, Any]) -> str:
-    """
-    Sanitize text to handle Unicode and encoding issues
-    
-    Args:
-        text: Text to sanitize
-        
-    Returns:
-        str: Sanitized text
-    """
-    if not isinstance(text, str):
-        return str(text)
-    
-    # Escape non-ASCII characters
-    return text.encode('ascii', 'backslashreplace').decode('ascii')
+# Word lists for simple sentiment analysis, compiled into one alternation
+# (ASCII-only case folding, so every match lowercases back to a listed word)
+_MOOD_WORDS = {
+    "positive": ["楽しい", "嬉しい", "面白い", "すごい", "好き", "最高", "happy", "fun", "great"],
+    "negative": ["難しい", "悲しい", "辛い", "苦しい", "嫌い", "最悪", "sad", "hard", "tough"],
+    "excited": ["わくわく", "興奮", "激アツ", "テンション", "excited", "amazing"],
+}
+_WORD_TO_MOOD = {word: mood for mood, words in _MOOD_WORDS.items() for word in words}
+_MOOD_PATTERN = re.compile(
+    "|".join(re.escape(word) for word in sorted(_WORD_TO_MOOD, key=len, reverse=True)),
+    re.IGNORECASE | re.ASCII
+)
 
 
 def extract_keywords(text: str, min_length: int = 3) -> List[str]:
@@ -96,24 +90,17 @@ def calculate_mood(content: str) -> str:
     Returns:
         str: Detected mood
     """
-    # Word lists for simple sentiment analysis
-    positive_words = ["楽しい", "嬉しい", "面白い", "すごい", "好き", "最高", "happy", "fun", "great"]
-    negative_words = ["難しい", "悲しい", "辛い", "苦しい", "嫌い", "最悪", "sad", "hard", "tough"]
-    excited_words = ["わくわく", "興奮", "激アツ", "テンション", "excited", "amazing"]
-    
-    content_lower = content.lower()
-    
-    # Count sentiment words
-    positive_count = sum([1 for word in positive_words if word in content_lower])
-    negative_count = sum([1 for word in negative_words if word in content_lower])
-    excited_count = sum([1 for word in excited_words if word in content_lower])
+    # Count distinct sentiment words in a single case-insensitive pass
+    counts = {"positive": 0, "negative": 0, "excited": 0}
+    for word in {match.lower() for match in _MOOD_PATTERN.findall(content)}:
+        counts[_WORD_TO_MOOD[word]] += 1
     
     # Determine mood
-    if excited_count > 0:
+    if counts["excited"] > 0:
         return "excited"
-    elif positive_count > negative_count:
+    elif counts["positive"] > counts["negative"]:
         return "positive"
-    elif negative_count > positive_count:
+    elif counts["negative"] > counts["positive"]:
         return "negative"
     else:
         return "neutral"
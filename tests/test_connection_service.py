@@ -0,0 +1,100 @@
+"""
+Tests for the connection service
+"""
+import asyncio
+
+import orjson
+
+from bot_system.services.connection_service import BOT_QUEUE_SIZE, BotConnection, ConnectionService
+
+
+class FakeWebSocket:
+    """Fake WebSocket recording sent frames, optionally failing every send"""
+    
+    def __init__(self, error=None):
+        self.error = error
+        self.frames = []
+    
+    async def accept(self):
+        pass
+    
+    async def close(self, code=1000, reason=None):
+        pass
+    
+    async def send_bytes(self, data):
+        if self.error is not None:
+            raise self.error
+        self.frames.append(orjson.loads(data))
+
+
+async def settle():
+    """Let writer tasks drain their queues"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_full_queue_drops_messages():
+    async def run():
+        service = ConnectionService()
+        bot = FakeWebSocket()
+        # No writer task, so nothing drains the queue
+        connection = service.bot_viewers[bot] = BotConnection()
+        for i in range(BOT_QUEUE_SIZE + 1):
+            assert await service.send_to_bot(bot, {"i": i})
+        return connection.queue
+    
+    queue = asyncio.run(run())
+    assert queue.qsize() == BOT_QUEUE_SIZE
+    assert orjson.loads(queue.get_nowait()) == {"i": 0}
+
+
+def test_writer_merges_queued_messages_into_one_frame():
+    async def run():
+        service = ConnectionService()
+        bot = FakeWebSocket()
+        await service.connect_bot_viewer(bot)
+        for i in range(3):
+            await service.send_to_bot(bot, {"i": i})
+        await settle()
+        return bot.frames
+    
+    assert asyncio.run(run()) == [[{"i": 0}, {"i": 1}, {"i": 2}]]
+
+
+def test_send_error_disconnects_the_bot_and_announces_it_once():
+    async def run():
+        service = ConnectionService()
+        broadcaster = FakeWebSocket()
+        bot = FakeWebSocket(error=RuntimeError("connection lost"))
+        await service.connect_broadcaster(broadcaster)
+        await service.connect_bot_viewer(bot)
+        await service.send_to_bot(bot, {"type": "stream_content"})
+        await settle()
+        
+        disconnected = service.get_bot_count() == 0
+        # The endpoint disconnects the same bot again when its receive loop ends
+        removed_again = await service.disconnect_bot_viewer(bot)
+        sent = await service.send_to_bot(bot, {"type": "stream_content"})
+        await settle()
+        return disconnected, removed_again, sent, broadcaster.frames
+    
+    disconnected, removed_again, sent, frames = asyncio.run(run())
+    assert disconnected
+    assert not removed_again
+    assert not sent
+    assert [(f["type"], f["event"]) for f in frames] == [("viewer_update", "leave")]
+
+
+def test_repeated_heartbeat_frame_is_not_recorded_again():
+    async def run():
+        service = ConnectionService()
+        bot = FakeWebSocket()
+        await service.connect_bot_viewer(bot)
+        frame = '{"type": "heartbeat", "bot_info": {"name": "bot"}}'
+        return [
+            service.record_heartbeat(bot, frame),
+            service.record_heartbeat(bot, frame),
+            service.record_heartbeat(bot, frame.replace("bot", "bot2")),
+        ]
+    
+    assert asyncio.run(run()) == [True, False, True]
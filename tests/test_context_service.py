@@ -0,0 +1,15 @@
+"""
+Tests for the stream context service
+"""
+from bot_system.services.context_service import StreamContextService
+
+
+def test_analyze_mood_matches_ascii_case_insensitively():
+    service = StreamContextService()
+    assert service.analyze_mood("This is AMAZING").mood == "excited"
+
+
+def test_analyze_mood_ignores_unicode_case_folded_keywords():
+    # "ſad" and "EXCİTED" only match "sad"/"excited" under Unicode case folding
+    service = StreamContextService()
+    assert service.analyze_mood("ſad EXCİTED").mood == "neutral"
@@ -0,0 +1,28 @@
+"""
+Tests for message models
+"""
+import orjson
+
+from bot_system.models.message import BotReaction
+
+
+def test_parse_batch_skips_invalid_items_and_keeps_valid_ones():
+    data = orjson.dumps([
+        {"type": "receive_stream_content", "content": "こんにちは"},
+        {"type": "reaction", "content": 123},
+        "not a message",
+        {"type": "reaction", "content": "いいね"},
+    ]).decode()
+    
+    messages = BotReaction.parse_batch(data)
+    
+    assert [(m.type, m.content) for m in messages] == [
+        ("receive_stream_content", "こんにちは"),
+        ("reaction", "いいね"),
+    ]
+
+
+def test_parse_batch_parses_a_single_message():
+    messages = BotReaction.parse_batch('{"type": "reaction", "content": "いいね"}')
+    
+    assert [(m.type, m.content) for m in messages] == [("reaction", "いいね")]
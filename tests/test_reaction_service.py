@@ -0,0 +1,154 @@
+"""
+Tests for the reaction service
+"""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+
+from bot_system.models.stream_context import StreamContext
+from bot_system.services.reaction_service import (
+    FALLBACK_RESPONSES,
+    TRIVIAL_REACTIONS,
+    ReactionInterrupted,
+    ReactionService,
+)
+
+BOT_INFO = {"personality_type": "funny", "interests": ["Programming"], "emoji_usage": "high"}
+
+
+def make_chunk(index, content):
+    """Build a streamed completion chunk with a single choice"""
+    return SimpleNamespace(choices=[SimpleNamespace(index=index, delta=SimpleNamespace(content=content))])
+
+
+class FakeCompletions:
+    """Fake chat completions API streaming fixed parts for every requested choice"""
+    
+    def __init__(self, parts=("わぁ", "すごい"), error=None):
+        self.parts = parts
+        self.error = error
+        self.calls = []
+    
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        
+        async def stream():
+            for part in self.parts:
+                for index in range(kwargs.get("n", 1)):
+                    yield make_chunk(index, f"{part}{index}")
+            if self.error is not None:
+                raise self.error
+        
+        return stream()
+
+
+def make_service(completions, **kwargs):
+    """Create a reaction service backed by fake completions"""
+    service = ReactionService(openai_api_key="test", **kwargs)
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return service
+
+
+def test_timeout_after_first_delta_falls_back_and_is_not_cached():
+    completions = FakeCompletions(parts=("途中",), error=httpx.ReadTimeout("timed out"))
+    
+    async def run():
+        service = make_service(completions)
+        reaction = await service.generate_reaction("配信を始めます", BOT_INFO)
+        return service, reaction
+    
+    service, reaction = asyncio.run(run())
+    assert reaction in FALLBACK_RESPONSES
+    assert not service._reaction_cache
+
+
+def test_timeout_after_first_delta_interrupts_the_stream():
+    completions = FakeCompletions(parts=("途中",), error=httpx.ReadTimeout("timed out"))
+    
+    async def run():
+        service = make_service(completions)
+        received = []
+        try:
+            async for delta in service.stream_reaction("配信を始めます", BOT_INFO):
+                received.append(delta)
+        except ReactionInterrupted as e:
+            return received, e.fallback
+        return received, None
+    
+    received, fallback = asyncio.run(run())
+    assert received == ["途中0"]
+    assert fallback in FALLBACK_RESPONSES
+
+
+def test_lone_request_does_not_wait_for_the_batch_window(monkeypatch):
+    monkeypatch.setattr("bot_system.services.reaction_service.REACTION_BATCH_WINDOW", 5.0)
+    completions = FakeCompletions()
+    
+    async def run():
+        service = make_service(completions)
+        return await asyncio.wait_for(service.generate_reaction("配信を始めます", BOT_INFO), timeout=1.0)
+    
+    assert asyncio.run(run()) == "わぁ0すごい0"
+
+
+def test_title_change_misses_the_cache():
+    completions = FakeCompletions()
+    
+    async def run():
+        service = make_service(completions)
+        context = StreamContext(title="Python配信")
+        await service.generate_reaction("配信を始めます", BOT_INFO, context)
+        await service.generate_reaction("配信を始めます", BOT_INFO, context)
+        context.set_title("ゲーム配信")
+        await service.generate_reaction("配信を始めます", BOT_INFO, context)
+    
+    asyncio.run(run())
+    assert len(completions.calls) == 2
+
+
+def test_cached_reaction_skips_the_api_until_it_expires():
+    completions = FakeCompletions()
+    
+    async def run(service):
+        first = await service.generate_reaction("配信を始めます", BOT_INFO)
+        second = await service.generate_reaction("配信を始めます", BOT_INFO)
+        return first, second
+    
+    assert asyncio.run(run(make_service(completions))) == ("わぁ0すごい0", "わぁ0すごい0")
+    assert len(completions.calls) == 1
+    
+    expiring = FakeCompletions()
+    asyncio.run(run(make_service(expiring, cache_ttl=0)))
+    assert len(expiring.calls) == 2
+
+
+def test_concurrent_requests_fan_out_by_choice_index():
+    completions = FakeCompletions()
+    
+    async def run():
+        service = make_service(completions)
+        return await asyncio.gather(*(service.generate_reaction("配信を始めます", BOT_INFO) for _ in range(3)))
+    
+    assert asyncio.run(run()) == ["わぁ0すごい0", "わぁ1すごい1", "わぁ2すごい2"]
+    assert len(completions.calls) == 1
+    assert completions.calls[0]["n"] == 3
+
+
+def test_trivial_content_gets_a_canned_reaction_without_the_api():
+    completions = FakeCompletions()
+    reaction = asyncio.run(make_service(completions).generate_reaction("ｗｗｗ！！", BOT_INFO))
+    assert reaction in TRIVIAL_REACTIONS["funny"]
+    assert not completions.calls
+
+
+def test_error_before_any_delta_returns_a_fallback():
+    completions = FakeCompletions(parts=(), error=httpx.ConnectError("unreachable"))
+    
+    async def run():
+        service = make_service(completions)
+        return service, await service.generate_reaction("配信を始めます", BOT_INFO)
+    
+    service, reaction = asyncio.run(run())
+    assert reaction in FALLBACK_RESPONSES
+    assert not service._reaction_cache
@@ -0,0 +1,13 @@
+"""
+Tests for utility functions
+"""
+from bot_system.utils import calculate_mood
+
+
+def test_calculate_mood_matches_ascii_case_insensitively():
+    assert calculate_mood("So HAPPY today") == "positive"
+
+
+def test_calculate_mood_ignores_unicode_case_folded_words():
+    # "ſad" and "EXCİTED" only match "sad"/"excited" under Unicode case folding
+    assert calculate_mood("ſad EXCİTED") == "neutral"